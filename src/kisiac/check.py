@@ -1,47 +1,80 @@
-import json
+import os
+from bisect import insort
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import PurePosixPath
 
-from kisiac.common import UserError, exists_cmd, log_msg, run_cmd
-from kisiac.filesystems import DeviceInfos
+from kisiac.common import UserError, exists_cmd, json_loads, log_msg, run_cmd
 from kisiac.lvm import LVMSetup
 
 
+def scan_open(host: str) -> list[tuple[PurePosixPath, str | None]]:
+    """Enumerate SMART-capable devices via a single smartctl invocation."""
+    output = json_loads(
+        run_cmd(
+            ["smartctl", "--scan-open", "--json"],
+            host=host,
+            sudo=True,
+        ).stdout
+    )
+    return [
+        (PurePosixPath(device["name"]), device.get("type"))
+        for device in output.get("devices", [])
+    ]
+
+
+def _probe(
+    host: str, device: PurePosixPath, device_type: str | None
+) -> tuple[PurePosixPath, int, dict]:
+    res = run_cmd(
+        [
+            "smartctl",
+            "-H",
+            "--json",
+            *(["-d", device_type] if device_type is not None else []),
+            device,
+        ],
+        host=host,
+        sudo=True,
+        check=False,
+    )
+    return device, res.returncode, json_loads(res.stdout)
+
+
 def check_host(host: str) -> None:
     if not exists_cmd("smartctl", host, sudo=True):
         raise UserError("smartctl not found, install smartmontools")
-    device_infos = DeviceInfos(host)
 
     healthy_devices = []
     unhealthy_devices = []
     error_msgs = []
 
-    for device_info in device_infos:
-        if device_info.device_type == "disk":
-            res = run_cmd(
-                [
-                    "smartctl",
-                    "-H",
-                    "--json",
-                    device_info.device,
-                ],
-                sudo=True,
-                check=False,
-            )
-            output = json.loads(res.stdout)
-            if res.returncode != 0:
+    # scan-open only reports devices that smartctl can actually open, hence no
+    # further filtering by device type is needed
+    devices = scan_open(host)
+    # probes are subprocess-bound and independent, hence run them concurrently
+    with ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 2)) as executor:
+        futures = [
+            executor.submit(_probe, host, device, device_type)
+            for device, device_type in devices
+        ]
+        for future in as_completed(futures):
+            device, returncode, output = future.result()
+            if returncode != 0:
                 error_msgs.extend(
                     msg["string"] for msg in output["smartctl"]["messages"]
                 )
                 continue
+            # insert sorted right away, avoiding a separate sort plus string
+            # conversion pass when logging
             if output["smart_status"]["passed"]:
-                healthy_devices.append(device_info.device)
+                insort(healthy_devices, device, key=str)
             else:
-                unhealthy_devices.append(device_info.device)
+                insort(unhealthy_devices, device, key=str)
 
-    def log_status(devices, status):
+    def log_status(devices: list[PurePosixPath], status: str) -> None:
         if not devices:
             return
-        devices = "\n".join(sorted(map(str, devices)))
-        log_msg(f"{status} devices: {devices}", host=host)
+        log_msg(f"{status} devices: " + "\n".join(map(str, devices)), host=host)
 
     log_status(unhealthy_devices, "Unhealthy")
     log_status(healthy_devices, "Healthy")
@@ -1,12 +1,21 @@
+from contextlib import contextmanager
 from enum import StrEnum
-from pathlib import Path
+from pathlib import Path, PurePath
+import signal
 import subprocess as sp
 import sys
-from typing import Any, Callable, Iterable, Self, Sequence
+from typing import IO, Any, Callable, Iterable, Iterator, Self, Sequence
 import os
 
 import inquirer
 
+try:
+    # use orjson for parsing the potentially large JSON outputs of lsblk,
+    # lvs/vgs/pvs, smartctl and cryptsetup if available
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads  # noqa: F401
+
 
 cache = Path("~/.cache/kisiac").expanduser()
 
@@ -125,19 +134,25 @@ def cmd_to_str(*cmds: Sequence[str]) -> str:
     return "\n".join(" ".join(map(str, cmd)) for cmd in cmds)
 
 
-def run_cmd(
-    cmd: Sequence[str | Path],
-    input: str | None = None,
-    host: str = "localhost",
-    env: dict[str, Any] | None = None,
-    sudo: bool = False,
-    user_error: bool = True,
-    user_error_msg: str = "",
-    check: bool = True,
-) -> sp.CompletedProcess[str]:
-    """Run a system command using subprocess.run and check for errors."""
-
-    def fmt_cmd_item(item: str | Path) -> str:
+def _ssh_multiplex_args() -> list[str]:
+    # reuse a persistent multiplexed connection per host, avoiding one ssh
+    # handshake per command
+    control_dir = cache / "ssh"
+    control_dir.mkdir(parents=True, exist_ok=True)
+    return [
+        "-o",
+        "ControlMaster=auto",
+        "-o",
+        "ControlPersist=60s",
+        "-o",
+        f"ControlPath={control_dir}/%C",
+    ]
+
+
+def _postprocess_cmd(
+    cmd: Sequence[str | PurePath], host: str, sudo: bool
+) -> Sequence[str]:
+    def fmt_cmd_item(item: str | PurePath) -> str:
         str_item = str(item)
         if " " in str_item or "\t" in str_item:
             if '"' in str_item:
@@ -154,11 +169,33 @@ def run_cmd(
         if sudo:
             postprocesed_cmd = [
                 "ssh",
+                *_ssh_multiplex_args(),
                 host,
                 f"sudo bash -c '{' '.join(postprocesed_cmd)}'",
             ]
         else:
-            postprocesed_cmd = ["ssh", host, f"{' '.join(postprocesed_cmd)}"]
+            postprocesed_cmd = [
+                "ssh",
+                *_ssh_multiplex_args(),
+                host,
+                f"{' '.join(postprocesed_cmd)}",
+            ]
+    return postprocesed_cmd
+
+
+def run_cmd(
+    cmd: Sequence[str | PurePath],
+    input: str | None = None,
+    host: str = "localhost",
+    env: dict[str, Any] | None = None,
+    sudo: bool = False,
+    user_error: bool = True,
+    user_error_msg: str = "",
+    check: bool = True,
+) -> sp.CompletedProcess[str]:
+    """Run a system command using subprocess.run and check for errors."""
+
+    postprocesed_cmd = _postprocess_cmd(cmd, host, sudo)
     log_msg("Running command", cmd_to_str(postprocesed_cmd), host=host)
     try:
         return sp.run(
@@ -184,6 +221,55 @@ def run_cmd(
             raise
 
 
+@contextmanager
+def stream_cmd(
+    cmd: Sequence[str | PurePath],
+    host: str = "localhost",
+    sudo: bool = False,
+    user_error: bool = True,
+    user_error_msg: str = "",
+) -> Iterator[IO[str]]:
+    """Run a system command and yield its stdout as a file-like object.
+
+    This allows e.g. streaming JSON decoding without buffering the whole
+    output into a string first. Errors are checked once the context exits.
+    """
+    postprocesed_cmd = _postprocess_cmd(cmd, host, sudo)
+    log_msg("Running command", cmd_to_str(postprocesed_cmd), host=host)
+
+    def raise_error(stderr: str) -> None:
+        if user_error:
+            msg = f"{user_error_msg}: " if user_error_msg else ""
+            raise UserError(
+                f"{msg}Error occurred while running command "
+                f"'{' '.join(postprocesed_cmd)}': {stderr}"
+            )
+
+    with sp.Popen(postprocesed_cmd, text=True, stdout=sp.PIPE, stderr=sp.PIPE) as proc:
+        assert proc.stdout is not None and proc.stderr is not None
+        try:
+            yield proc.stdout
+        except Exception:
+            # e.g. parsing of truncated output failed because the command
+            # itself failed; prefer reporting the command error in that case.
+            # Close stdout first so that the child cannot block on writing
+            # output that is no longer consumed while we read stderr. A child
+            # dying of SIGPIPE failed because of that closing, not on its own,
+            # hence propagate the original error then.
+            proc.stdout.close()
+            stderr = proc.stderr.read()
+            returncode = proc.wait()
+            if returncode != 0 and returncode != -signal.SIGPIPE:
+                raise_error(stderr)
+            raise
+        stderr = proc.stderr.read()
+        if proc.wait() != 0:
+            raise_error(stderr)
+            raise sp.CalledProcessError(
+                proc.returncode, postprocesed_cmd, stderr=stderr
+            )
+
+
 class UserError(Exception):
     """Base class for user-related errors."""
 
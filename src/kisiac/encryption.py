@@ -1,12 +1,11 @@
 from dataclasses import dataclass
-import json
 from pathlib import Path
 from typing import Any, Iterator, Self
 
-from kisiac.common import UserError, check_type, run_cmd
+from kisiac.common import UserError, check_type, json_loads, run_cmd
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Encryption:
     name: str | None
     device: Path
@@ -39,7 +38,7 @@ class Encryption:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class EncryptionSetup:
     encryptions: set[Encryption]
 
@@ -88,7 +87,7 @@ class EncryptionSetup:
                 # not (yet) a luks device
                 continue
 
-            output = json.loads(res.stdout)
+            output = json_loads(res.stdout)
 
             # TODO find a way to retrieve the key_size from the system
             encryptions.add(
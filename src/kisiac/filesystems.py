@@ -2,21 +2,49 @@ from typing import ClassVar
 from copy import copy
 from dataclasses import dataclass, field
 import json
-from pathlib import Path
+from pathlib import PurePath, PurePosixPath
 import re
 import subprocess as sp
 from typing import Any, Iterator, Self
-from kisiac.common import HostAgnosticPath, UserError, confirm_action, run_cmd
+from kisiac.common import (
+    HostAgnosticPath,
+    UserError,
+    confirm_action,
+    run_cmd,
+    stream_cmd,
+)
 from kisiac.config import Config, Filesystem, UserSet
 
 from pyfstab import Fstab
 
-blkid_attrs_re = re.compile(r'(?P<attr>[A-Z]+)="(?P<value>\S+)"')
+mapper_dash_re = re.compile(r"(?P<pre>[^-])-(?P<post>[^-])")
+
+
+_device_infos_cache: dict[str, "DeviceInfos"] = {}
+
+
+def get_device_infos(host: str) -> "DeviceInfos":
+    """Return a per-host DeviceInfos instance, shared across entry points.
+
+    Device information does not change between passes unless we modify the
+    block devices ourselves, in which case callers have to invalidate the
+    cache via invalidate_device_infos.
+    """
+    device_infos = _device_infos_cache.get(host)
+    if device_infos is None:
+        device_infos = _device_infos_cache[host] = DeviceInfos(host)
+    return device_infos
+
+
+def invalidate_device_infos(host: str) -> None:
+    """Drop the cached DeviceInfos after mutating block devices."""
+    _device_infos_cache.pop(host, None)
 
 
 def update_filesystems(host: str) -> None:
-    filesystems = set(Config.get_instance().filesystems)
-    device_infos = DeviceInfos(host)
+    # sort once; also makes the order of the generated commands deterministic
+    filesystems = sorted(set(Config.get_instance().filesystems))
+    device_infos = get_device_infos(host)
 
     # First, create filesystems that do not exist yet or need to be changed.
     mkfs_cmds = []
@@ -34,24 +62,20 @@ def update_filesystems(host: str) -> None:
     mkfs_cmds_msg = "\n".join(" ".join(cmd) for cmd in mkfs_cmds)
 
     new_fstab = Fstab()
-    new_fstab.entries = [
-        filesystem.to_fstab_entry() for filesystem in sorted(filesystems)
-    ]
+    new_fstab.entries = [filesystem.to_fstab_entry() for filesystem in filesystems]
+    new_fstab_text = new_fstab.write_string()
 
     if mkfs_cmds and confirm_action(
         f"The following mkfs commands will be executed:\n{mkfs_cmds_msg}"
     ):
         for cmd in mkfs_cmds:
             run_cmd(cmd, sudo=True, host=host)
+        invalidate_device_infos(host)
 
-    if str(new_fstab) != str(old_fstab) and confirm_action(
-        f"\nThe following will be the new fstab:\n{new_fstab.write_string()}"
+    if new_fstab_text != str(old_fstab) and confirm_action(
+        f"\nThe following will be the new fstab:\n{new_fstab_text}"
     ):
-        new_fstab = Fstab()
-        new_fstab.entries = [
-            filesystem.to_fstab_entry() for filesystem in sorted(filesystems)
-        ]
-        fstab_path.write_text(new_fstab.write_string())
+        fstab_path.write_text(new_fstab_text)
 
     for filesystem in filesystems:
         if filesystem.mountpoint is not None:
@@ -74,12 +98,17 @@ def update_permissions(host: str) -> None:
     for path, permissions in permissions.items():
         host_path = HostAgnosticPath(path, host=host, sudo=True)
 
+        # chmod accepts comma separated clauses, hence apply all special bits
+        # in a single invocation
+        special_modes = []
         if permissions.setgid:
-            host_path.chmod("g+s", only_dirs=True)
+            special_modes.append("g+s")
         if permissions.setuid:
-            host_path.chmod("u+s", only_dirs=True)
+            special_modes.append("u+s")
         if permissions.sticky:
-            host_path.chmod("+t", only_dirs=True)
+            special_modes.append("+t")
+        if special_modes:
+            host_path.chmod(*special_modes, only_dirs=True)
 
         user_perms = PermissionFlagHandler(prefix="u")
         group_perms = PermissionFlagHandler(prefix="g")
@@ -170,49 +199,76 @@ class PermissionFlagHandler:
         self.flags.clear()
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class DeviceInfo:
-    device: Path
+    # a pure path suffices (and is cheaper to construct) since devices are
+    # only compared, hashed and passed to commands, never accessed directly
+    device: PurePosixPath
     device_type: str
     fs_type: str | None
     label: str | None
     uuid: str | None
     children: list[Self] = field(default_factory=list)
 
-    def with_device(self, device: Path) -> Self:
+    def with_device(self, device: PurePosixPath) -> Self:
         info = copy(self)
         info.device = device
         return info
 
+    def __eq__(self, other: object) -> bool:
+        # identified by device path, allowing set/dict membership tests
+        return isinstance(other, DeviceInfo) and self.device == other.device
+
+    def __hash__(self) -> int:
+        return hash(self.device)
+
 
 class DeviceInfos:
     def __init__(self, host: str) -> None:
         self.infos: list[DeviceInfo] = []
+        self._by_device: dict[PurePath, DeviceInfo] = {}
+        self._by_label: dict[str, DeviceInfo] = {}
+        self._by_uuid: dict[str, DeviceInfo] = {}
+        # devices not reported by the initial lsblk run, resolved via a
+        # per-device fallback query and cached here
+        self._fallback_infos: dict[PurePath, DeviceInfo] = {}
         self.host = host
         self._from_system(update=True)
 
+    def _register(self, device_info: DeviceInfo) -> None:
+        if device_info.device in self._by_device:
+            # already reported under the same path, avoid duplicate records
+            return
+        self.infos.append(device_info)
+        self._by_device[device_info.device] = device_info
+        if device_info.label is not None:
+            self._by_label.setdefault(device_info.label, device_info)
+        if device_info.uuid is not None:
+            self._by_uuid.setdefault(device_info.uuid, device_info)
+
     def _from_system(
-        self, update: bool, device: Path | None = None
+        self, update: bool, device: PurePath | None = None
     ) -> DeviceInfo | None:
         typo_hint = "Typo in the device name?" if device else ""
-        lsblk_output = json.loads(
-            run_cmd(
-                [
-                    "lsblk",
-                    "--json",
-                    "--paths",
-                    "--output",
-                    "NAME,FSTYPE,LABEL,UUID,TYPE",
-                    *([device] if device else []),
-                ],
-                sudo=True,
-                host=self.host,
-                user_error_msg=f"Unable to retrieve device info.{typo_hint}",
-            ).stdout
-        )
+        # stream the lsblk output into the JSON decoder instead of buffering
+        # it into a string first
+        with stream_cmd(
+            [
+                "lsblk",
+                "--json",
+                "--paths",
+                "--output",
+                "NAME,FSTYPE,LABEL,UUID,TYPE",
+                *([device] if device else []),
+            ],
+            sudo=True,
+            host=self.host,
+            user_error_msg=f"Unable to retrieve device info.{typo_hint}",
+        ) as stdout:
+            lsblk_output = json.load(stdout)
 
         def parse_entry(entry: dict[str, Any]) -> DeviceInfo:
-            reported_device = Path(entry["name"])
+            reported_device = PurePosixPath(entry["name"])
             device_info = DeviceInfo(
                 device=reported_device,
                 device_type=entry["type"],
@@ -221,19 +277,20 @@ class DeviceInfos:
                 uuid=entry["uuid"],
             )
             if update:
-                self.infos.append(device_info)
-                if reported_device.is_relative_to(Path("/dev/mapper")):
+                self._register(device_info)
+                if reported_device.is_relative_to(PurePosixPath("/dev/mapper")):
                     # also add /dev/vgname/lvname path for LVM logical volumes
-                    reported_device = Path("/dev") / re.sub(
-                        r"(?P<pre>[^-])-(?P<post>[^-])",
+                    reported_device = PurePosixPath("/dev") / mapper_dash_re.sub(
                         r"\g<pre>/\g<post>",
                         reported_device.name,
                         count=1,
                     ).replace("--", "-")
-                    self.infos.append(device_info.with_device(Path(reported_device)))
+                    self._register(device_info.with_device(reported_device))
 
             for child in entry.get("children", []):
-                device_info.children.append(parse_entry(child))
+                child_info = parse_entry(child)
+                if child_info not in device_info.children:
+                    device_info.children.append(child_info)
             return device_info
 
         device_info = None
@@ -245,37 +302,36 @@ class DeviceInfos:
             return device_info
 
     def get_info(self, filesystem: Filesystem) -> DeviceInfo:
-        def is_targeted_by_filesystem(device_info: DeviceInfo) -> bool:
-            if filesystem.label is not None:
-                return device_info.label == filesystem.label
-            elif filesystem.uuid is not None:
-                return device_info.uuid == filesystem.uuid
-            else:
-                return False
-
         if filesystem.device is not None:
-            return self.get_info_for_device(filesystem.device)
-
-        for info in self.infos:
-            if is_targeted_by_filesystem(info):
-                return info
+            # configured devices may legitimately be missing from the initial
+            # listing (e.g. excluded device types), hence allow probing
+            return self.get_info_for_device(filesystem.device, allow_probe=True)
+
+        info = None
+        if filesystem.label is not None:
+            info = self._by_label.get(filesystem.label)
+        elif filesystem.uuid is not None:
+            info = self._by_uuid.get(filesystem.uuid)
+        if info is not None:
+            return info
 
         raise UserError(
             f"No device found for filesystem with device={filesystem.device}, "
             f"label={filesystem.label}, uuid={filesystem.uuid}"
         )
 
-    def get_info_for_device(self, device: Path) -> DeviceInfo:
-        def find_device() -> DeviceInfo | None:
-            for info in self.infos:
-                if info.device == device:
-                    return info
-
-        found_device = find_device()
+    def get_info_for_device(
+        self, device: PurePath, allow_probe: bool = False
+    ) -> DeviceInfo:
+        found_device = self._by_device.get(device) or self._fallback_infos.get(device)
         if found_device is None:
+            if not allow_probe:
+                # every present block device is part of the initial listing,
+                # hence fail early instead of probing via another lsblk call
+                raise UserError(f"Unknown device: {device}. Typo?")
             found_device = self._from_system(update=False, device=device)
             assert found_device is not None
-            return found_device
+            self._fallback_infos[device] = found_device
 
         return found_device
 
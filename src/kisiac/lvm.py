@@ -1,14 +1,16 @@
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from enum import StrEnum
-import json
-from pathlib import Path
+from itertools import groupby
+from operator import itemgetter
+from pathlib import PurePosixPath
 import re
 from typing import Any, Iterable, Self
 
 from humanfriendly import parse_size
 
-from kisiac.common import check_type, exists_cmd, run_cmd, UserError
+from kisiac.common import check_type, exists_cmd, json_loads, run_cmd, UserError
 
 
 CRYPT_PREFIX = "crypt_"
@@ -24,9 +26,9 @@ def parse_lv_name(name_entry) -> tuple[str, bool]:
         return name_entry, False
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PV:
-    device: Path
+    device: PurePosixPath
 
 
 class Subvolume(StrEnum):
@@ -38,7 +40,7 @@ def _subvolume_name(lv_name: str, subvolume: Subvolume) -> str:
     return f"{lv_name}_{subvolume}"
 
 
-@dataclass
+@dataclass(slots=True)
 class LV:
     name: str
     layout: set[str]
@@ -134,17 +136,17 @@ class LV:
         return []
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class VG:
     name: str
     pvs: dict[str | None, set[PV]] = field(default_factory=dict)
     lvs: dict[str, LV] = field(default_factory=dict)
 
-    def get_lv_device(self, lv_name: str) -> Path:
-        return Path("/dev") / self.name / lv_name
+    def get_lv_device(self, lv_name: str) -> PurePosixPath:
+        return PurePosixPath("/dev") / self.name / lv_name
 
 
-@dataclass
+@dataclass(slots=True)
 class LVMSetup:
     pvs: set[PV] = field(default_factory=set)
     vgs: dict[str, VG] = field(default_factory=dict)
@@ -161,7 +163,7 @@ class LVMSetup:
             check_type("lvm pv entry", pv, str)
             entities.pvs.add(
                 PV(
-                    device=Path(pv),
+                    device=PurePosixPath(pv),
                 )
             )
         for name, settings in config.get("vgs", {}).items():
@@ -204,7 +206,7 @@ class LVMSetup:
             pvs = {}
             for tag, pvs_entry in settings.get("pvs", {}).items():
                 check_type(f"vg {name} pvs entry", pvs_entry, list)
-                pvs[tag] = {PV(device=Path(pv)) for pv in pvs_entry}
+                pvs[tag] = {PV(device=PurePosixPath(pv)) for pv in pvs_entry}
 
             entities.vgs[name] = VG(
                 name=name,
@@ -221,8 +223,11 @@ class LVMSetup:
 
         entities: Self = cls()
 
-        lv_data = json.loads(
-            run_cmd(
+        # the three reports are independent read-only queries, hence fetch
+        # them concurrently
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            lv_future = executor.submit(
+                run_cmd,
                 [
                     "lvs",
                     "--all",
@@ -235,30 +240,16 @@ class LVMSetup:
                 ],
                 host=host,
                 sudo=True,
-            ).stdout
-        )["report"][0]["lv"]
-
-        vg_devices_raw = json.loads(
-            run_cmd(
+            )
+            # a single vgs report provides both the VG names and their devices
+            vg_future = executor.submit(
+                run_cmd,
                 ["vgs", "--options", "vg_name,devices", "--reportformat", "json"],
                 host=host,
                 sudo=True,
-            ).stdout
-        )["report"][0]["vg"]
-        vg_devices = defaultdict(list)
-        for entry in vg_devices_raw:
-            vg_devices[entry["vg_name"]].append(entry["devices"])
-
-        vg_data = json.loads(
-            run_cmd(
-                ["vgs", "--options", "vg_name", "--reportformat", "json"],
-                host=host,
-                sudo=True,
-            ).stdout
-        )["report"][0]["vg"]
-
-        pv_data = json.loads(
-            run_cmd(
+            )
+            pv_future = executor.submit(
+                run_cmd,
                 [
                     "pvs",
                     "--options",
@@ -268,11 +259,22 @@ class LVMSetup:
                 ],
                 host=host,
                 sudo=True,
-            ).stdout
-        )["report"][0]["pv"]
+            )
 
-        for entry in vg_data:
-            vg_name = entry["vg_name"]
+        lv_data = json_loads(lv_future.result().stdout)["report"][0]["lv"]
+
+        by_vg_name = itemgetter("vg_name")
+        vg_data = sorted(
+            json_loads(vg_future.result().stdout)["report"][0]["vg"], key=by_vg_name
+        )
+        vg_devices = {
+            vg_name: [entry["devices"] for entry in entries]
+            for vg_name, entries in groupby(vg_data, key=by_vg_name)
+        }
+
+        pv_data = json_loads(pv_future.result().stdout)["report"][0]["pv"]
+
+        for vg_name in vg_devices:
             entities.vgs[vg_name] = VG(name=vg_name)
 
         for vg_name, device_reports in vg_devices.items():
@@ -293,7 +295,7 @@ class LVMSetup:
             else:
                 pv_tag = None
 
-            pv_obj = PV(device=Path(pv_device))
+            pv_obj = PV(device=PurePosixPath(pv_device))
             entities.pvs.add(pv_obj)
             vg_name = entry["vg_name"]
             if vg_name and vg_name in entities.vgs:
@@ -354,7 +356,7 @@ def get_missing_pvs(device_reports: Iterable[str]) -> Iterable[PV]:
         if info == "missing":
             device = m.group("device")
             assert device is not None
-            yield PV(device=Path(device))
+            yield PV(device=PurePosixPath(device))
         else:
             try:
                 int(info)
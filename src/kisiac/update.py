@@ -14,7 +14,12 @@ from kisiac.common import (
     run_cmd,
 )
 from kisiac.encryption import EncryptionSetup
-from kisiac.filesystems import DeviceInfos, update_filesystems, update_permissions
+from kisiac.filesystems import (
+    get_device_infos,
+    invalidate_device_infos,
+    update_filesystems,
+    update_permissions,
+)
 from kisiac.runtime_settings import GlobalSettings, UpdateHostSettings
 from kisiac import users
 from kisiac.config import Config
@@ -159,12 +164,17 @@ def update_encryptions(host: str) -> None:
             run_cmd(cmd, host=host, sudo=True, user_error_msg=error_msg)
         for cmd in format_cmds:
             run_cmd(cmd, host=host, sudo=True, user_error_msg=error_msg, input=password)
+        invalidate_device_infos(host)
 
-    device_infos = DeviceInfos(host)
+    device_infos = get_device_infos(host)
     encryptions_to_open = [
         encryption
         for encryption in desired
-        if not device_infos.get_info_for_device(encryption.device).children
+        # encryption devices are config-specified and may use symlinks such as
+        # /dev/disk/by-id that the initial listing does not cover
+        if not device_infos.get_info_for_device(
+            encryption.device, allow_probe=True
+        ).children
     ]
 
     if encryptions_to_open:
@@ -173,12 +183,13 @@ def update_encryptions(host: str) -> None:
 
         for encryption in encryptions_to_open:
             encryption.open(host, password)
+        invalidate_device_infos(host)
 
 
 def update_lvm(host: str) -> None:
     desired = Config.get_instance().lvm
     current = LVMSetup.from_system(host=host)
-    device_infos = DeviceInfos(host)
+    device_infos = get_device_infos(host)
 
     cmds = []
 
@@ -373,3 +384,4 @@ def update_lvm(host: str) -> None:
                 sudo=True,
                 user_error_msg="Incomplete LVM update due to error (make sure to manually fix this!)",
             )
+        invalidate_device_infos(host)